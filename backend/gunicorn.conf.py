@@ -0,0 +1,18 @@
+# Production entrypoint, run from this directory: gunicorn -c gunicorn.conf.py
+import multiprocessing
+import os
+
+wsgi_app = "server:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# One Uvicorn worker per core; uvicorn picks up uvloop and httptools when installed
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = 120
+graceful_timeout = 30
+
+# Import the app once in the master and fork it (copy-on-write). No client connects
+# before fork: AsyncMongoClient is constructed at import but only opens sockets on
+# first use in a worker, and the httpx/Redis clients are created in the lifespan.
+# Keep any call that actually connects out of import time.
+preload_app = True
@@ -0,0 +1,38 @@
+"""Convert legacy ISO-string timestamps to native BSON dates.
+
+Documents written before datetimes were stored natively hold created_at/ended_at
+as ISO strings. Run once from this directory: python migrate_datetimes.py
+"""
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+DATE_FIELDS = {
+    "users": ["created_at"],
+    "voice_profiles": ["created_at"],
+    "calls": ["created_at", "ended_at"],
+    "tts_generations": ["created_at"],
+    "stt_transcriptions": ["created_at"],
+}
+
+def main():
+    client = MongoClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    
+    for collection, fields in DATE_FIELDS.items():
+        for field in fields:
+            # Pipeline update so the conversion runs server-side
+            result = db[collection].update_many(
+                {field: {"$type": "string"}},
+                [{"$set": {field: {"$toDate": f"${field}"}}}]
+            )
+            print(f"{collection}.{field}: converted {result.modified_count} documents")
+    
+    client.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,152 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Form
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, status, UploadFile, File, Form, BackgroundTasks
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse, ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.background import BackgroundTask
+from pymongo import AsyncMongoClient
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from gridfs import AsyncGridFSBucket
+from gridfs.errors import NoFile
+from bson import ObjectId
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Literal, Dict, Any
-import uuid
+from typing import List, Optional, Literal, Dict, Any, Tuple
+from uuid6 import uuid7
 from datetime import datetime, timezone, timedelta
 from emergentintegrations.llm.openai import OpenAIChatRealtime, UserMessage
 import jwt
 from passlib.context import CryptContext
 import json
-import base64
-import io
-from elevenlabs import ElevenLabs, VoiceSettings
+import orjson
+import httpx
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+import hmac
+import hashlib
+import secrets
+from cachetools import TTLCache
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncMongoClient(
+    mongo_url,
+    minPoolSize=int(os.environ.get('MONGO_MIN_POOL', '5')),
+    maxPoolSize=int(os.environ.get('MONGO_MAX_POOL', '50')),
+    maxIdleTimeMS=30000,
+    serverSelectionTimeoutMS=5000,
+    tz_aware=True
+)
 db = client[os.environ['DB_NAME']]
+# Generated TTS audio lives in GridFS; tts_generations only keeps a reference
+tts_audio_bucket = AsyncGridFSBucket(db, bucket_name="tts_audio")
+# Longest an archive write may hold up the client's audio stream before archiving is dropped
+TTS_ARCHIVE_WRITE_TIMEOUT_SECONDS = 2.0
+
+# Upper bound on documents returned by a single list request
+MAX_PAGE_SIZE = 1000
+
+# Multi-document transactions need a replica set or mongos; detected on startup
+MONGO_TRANSACTIONS_AVAILABLE = False
 
 # JWT settings
 JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'voice-clone-secret-key-2024')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 24
+JWT_ALGORITHMS = [JWT_ALGORITHM]
+jwt_decoder = jwt.PyJWT(options={"require": ["exp", "sub"]})
+
+# Authenticated user cache: blake2b(bearer token) -> (User, token exp). It is per
+# worker, so only the user's fixed fields (id, username, email) are trusted from it;
+# voice_profile_id can be up to a TTL stale and is re-read wherever it is returned.
+AUTH_CACHE_TTL_SECONDS = int(os.environ.get('AUTH_CACHE_TTL_SECONDS', '60'))
+user_cache = TTLCache(maxsize=10_000, ttl=AUTH_CACHE_TTL_SECONDS)
+
+# Recently verified logins: user id -> (HMAC of password, password hash).
+# The pepper is per-process and never persisted.
+LOGIN_CACHE_TTL_SECONDS = 300
+login_cache = TTLCache(maxsize=10_000, ttl=LOGIN_CACHE_TTL_SECONDS)
+LOGIN_CACHE_PEPPER = secrets.token_bytes(32)
 
 # ElevenLabs configuration
 ELEVENLABS_API_KEY = os.environ.get('ELEVENLABS_API_KEY')
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+ELEVENLABS_API_URL = "https://api.elevenlabs.io"
+ELEVENLABS_AVAILABLE = bool(ELEVENLABS_API_KEY)
+# Shared async HTTP client for the ElevenLabs REST API, created in lifespan
+eleven_http: Optional[httpx.AsyncClient] = None
+# Caps in-flight ElevenLabs requests per worker to stay under the plan's concurrency limit
+ELEVENLABS_MAX_CONCURRENCY = int(os.environ.get('ELEVENLABS_MAX_CONCURRENCY', '10'))
+eleven_semaphore = asyncio.Semaphore(ELEVENLABS_MAX_CONCURRENCY)
+
+# Optional Redis response cache, created in lifespan when REDIS_URL is set
+REDIS_URL = os.environ.get('REDIS_URL')
+redis_client: Optional[Redis] = None
+VOICES_CACHE_KEY = "elevenlabs:voices"
+VOICES_CACHE_TTL_SECONDS = 300
+voices_cache_lock = asyncio.Lock()
+# Returned by cache_get when Redis is configured but can't be reached
+CACHE_UNAVAILABLE = object()
+
+# Password hashing: argon2id for new hashes, bcrypt kept to verify (and upgrade) old ones
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__time_cost=2,
+    argon2__memory_cost=19456,
+    argon2__parallelism=1
+)
 security = HTTPBearer()
 
+async def ensure_indexes():
+    """Create the indexes backing the hot lookup paths (idempotent)"""
+    await db.users.create_index("email", unique=True)
+    await db.users.create_index("id", unique=True)
+    await db.calls.create_index("id", unique=True)
+    # Compound with created_at so the newest-first list pages are served from the index
+    await db.calls.create_index([("caller_id", 1), ("created_at", -1)])
+    await db.calls.create_index([("receiver_id", 1), ("created_at", -1)])
+    await db.voice_profiles.create_index([("user_id", 1), ("created_at", -1)])
+    await db.tts_generations.create_index("generation_id", unique=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global MONGO_TRANSACTIONS_AVAILABLE, eleven_http, redis_client
+    if REDIS_URL:
+        redis_client = Redis.from_url(REDIS_URL)
+    if ELEVENLABS_AVAILABLE:
+        eleven_http = httpx.AsyncClient(
+            base_url=ELEVENLABS_API_URL,
+            headers={"xi-api-key": ELEVENLABS_API_KEY},
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=50)
+        )
+    # hello doubles as the connection warm-up before the first request
+    hello = await client.admin.command("hello")
+    MONGO_TRANSACTIONS_AVAILABLE = "setName" in hello or hello.get("msg") == "isdbgrid"
+    await ensure_indexes()
+    yield
+    if eleven_http is not None:
+        await eleven_http.aclose()
+    if redis_client is not None:
+        await redis_client.aclose()
+    await client.close()
+
 # Create the main app without a prefix
-app = FastAPI(title="VoiceMirror - Advanced Voice Clone Stream API")
+app = FastAPI(
+    title="VoiceMirror - Advanced Voice Clone Stream API",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -54,45 +158,36 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize ElevenLabs client
-try:
-    if ELEVENLABS_API_KEY:
-        eleven_client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
-        logger.info("ElevenLabs client initialized successfully")
-        ELEVENLABS_AVAILABLE = True
-    else:
-        logger.warning("ElevenLabs API key not provided")
-        ELEVENLABS_AVAILABLE = False
-        eleven_client = None
-except Exception as e:
-    logger.error(f"Error initializing ElevenLabs: {e}")
-    ELEVENLABS_AVAILABLE = False
-    eleven_client = None
+if not ELEVENLABS_AVAILABLE:
+    logger.warning("ElevenLabs API key not provided")
 
 # Initialize OpenAI Realtime Chat with Emergent LLM key
-EMERGENT_LLM_KEY = "sk-emergent-982703428D01aAb3c5"
-
-# Try to initialize OpenAI realtime integration
-try:
-    chat = OpenAIChatRealtime(api_key=EMERGENT_LLM_KEY)
-    # Register OpenAI realtime router
-    OpenAIChatRealtime.register_openai_realtime_router(api_router, chat)
-    logger.info("OpenAI realtime integration initialized successfully")
-    REALTIME_AVAILABLE = True
-except Exception as e:
-    logger.warning(f"OpenAI realtime integration not available: {e}")
-    logger.info("Voice calls will use basic WebRTC without AI voice cloning")
-    REALTIME_AVAILABLE = False
-    chat = None
+EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
+REALTIME_AVAILABLE = False
+chat = None
+
+# The realtime routes must exist before api_router is mounted, so this stays at import
+# time, but it only runs when a key is configured
+if EMERGENT_LLM_KEY:
+    try:
+        chat = OpenAIChatRealtime(api_key=EMERGENT_LLM_KEY)
+        # Register OpenAI realtime router
+        OpenAIChatRealtime.register_openai_realtime_router(api_router, chat)
+        logger.info("OpenAI realtime integration initialized successfully")
+        REALTIME_AVAILABLE = True
+    except Exception as e:
+        logger.warning(f"OpenAI realtime integration not available: {e}")
 
-# Thread pool for async operations
-executor = ThreadPoolExecutor(max_workers=4)
+if not REALTIME_AVAILABLE:
+    if not EMERGENT_LLM_KEY:
+        logger.warning("Emergent LLM key not provided")
+    logger.info("Voice calls will use basic WebRTC without AI voice cloning")
 
 # Models
 class User(BaseModel):
     model_config = ConfigDict(extra="ignore")
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: str(uuid7()))
     username: str
     email: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -117,7 +212,7 @@ class UserResponse(BaseModel):
 class VoiceProfile(BaseModel):
     model_config = ConfigDict(extra="ignore")
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: str(uuid7()))
     user_id: str
     name: str
     voice_id: Optional[str] = None  # ElevenLabs voice ID
@@ -149,11 +244,13 @@ class TTSRequest(BaseModel):
     style: float = Field(default=0.0, ge=0.0, le=1.0)
     use_speaker_boost: bool = True
 
-class TTSResponse(BaseModel):
-    audio_url: str
+class TTSGeneration(BaseModel):
+    user_id: str
     text: str
     voice_id: str
-    generation_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    size: int = 0  # Bytes of audio streamed
+    audio_ref: Optional[str] = None  # GridFS file id, set once the audio is fully stored
+    generation_id: str = Field(default_factory=lambda: str(uuid7()))
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class STTRequest(BaseModel):
@@ -163,95 +260,229 @@ class STTRequest(BaseModel):
 class STTResponse(BaseModel):
     transcribed_text: str
     filename: str
-    transcription_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    transcription_id: str = Field(default_factory=lambda: str(uuid7()))
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class Call(BaseModel):
     model_config = ConfigDict(extra="ignore")
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: str(uuid7()))
     caller_id: str
     receiver_id: Optional[str] = None
     call_type: str = Field(default="voice_clone")
     status: str = Field(default="waiting")
-    room_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    room_id: str = Field(default_factory=lambda: str(uuid7()))
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     ended_at: Optional[datetime] = None
     voice_settings: Optional[dict] = None
 
+class CallParticipant(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str
+    username: str
+    email: str
+
+class CallDetails(Call):
+    caller: Optional[CallParticipant] = None
+    receiver: Optional[CallParticipant] = None
+
 class CallCreate(BaseModel):
     receiver_email: Optional[str] = None
     call_type: str = "voice_clone"
     voice_settings: Optional[dict] = None
 
+# Query projections derived from the models, so only fields the API uses cross the wire
+def model_projection(model: type[BaseModel], **extra: int) -> dict:
+    return {"_id": 0, **{name: 1 for name in model.model_fields}, **extra}
+
+USER_PROJECTION = model_projection(User)
+LOGIN_PROJECTION = model_projection(User, password_hash=1)
+VOICE_PROFILE_PROJECTION = model_projection(VoiceProfile)
+CALL_DETAILS_PROJECTION = model_projection(Call, **{
+    f"{role}.{name}": 1 for role in ("caller", "receiver") for name in CallParticipant.model_fields
+})
+
 # Helper functions
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    """Hash in a worker thread so the KDF doesn't block the event loop"""
+    return await asyncio.to_thread(pwd_context.hash, password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify in a worker thread; also returns a new hash if the stored one is deprecated"""
+    return await asyncio.to_thread(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def verify_login(user_id: str, plain_password: str, hashed_password: str) -> bool:
+    """Verify a login password, skipping the KDF for a recently verified one"""
+    digest = hmac.new(LOGIN_CACHE_PEPPER, plain_password.encode(), hashlib.sha256).digest()
+    cached = login_cache.get(user_id)
+    if cached is not None and cached[1] == hashed_password and hmac.compare_digest(cached[0], digest):
+        return True
+    
+    verified, new_hash = await verify_password(plain_password, hashed_password)
+    if not verified:
+        return False
+    
+    if new_hash:
+        # Upgrade legacy bcrypt hashes to argon2id on successful login
+        await db.users.update_one({"id": user_id}, {"$set": {"password_hash": new_hash}})
+        hashed_password = new_hash
+    
+    login_cache[user_id] = (digest, hashed_password)
+    return True
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS)
+    expire = datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
 
-def prepare_for_mongo(data: dict) -> dict:
-    """Convert datetime objects to ISO strings for MongoDB storage"""
-    for key, value in data.items():
-        if isinstance(value, datetime):
-            data[key] = value.isoformat()
-    return data
-
-def parse_from_mongo(item: dict) -> dict:
-    """Convert ISO strings back to datetime objects"""
-    for key, value in item.items():
-        if key in ['created_at', 'ended_at'] and isinstance(value, str):
-            try:
-                item[key] = datetime.fromisoformat(value)
-            except:
-                pass
-    return item
-
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    token = credentials.credentials
+    # Key on a digest so raw bearer tokens aren't held in memory
+    cache_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    cached = user_cache.get(cache_key)
+    if cached is not None:
+        user, exp = cached
+        if exp > time.time():
+            return user
+        user_cache.pop(cache_key, None)
+    
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
+        payload = jwt_decoder.decode(token, JWT_SECRET_KEY, algorithms=JWT_ALGORITHMS)
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    user_doc = await db.users.find_one({"id": user_id}, {"_id": 0})
+    user_doc = await db.users.find_one({"id": payload["sub"]}, USER_PROJECTION)
     if user_doc is None:
         raise HTTPException(status_code=404, detail="User not found")
     
-    user_doc = parse_from_mongo(user_doc)
-    return User(**user_doc)
+    user = User(**user_doc)
+    user_cache[cache_key] = (user, payload["exp"])
+    return user
 
-def run_sync(func):
-    """Run sync function in thread pool"""
-    loop = asyncio.get_event_loop()
-    return loop.run_in_executor(executor, func)
+async def save_active_voice_profile(profile: VoiceProfile, user_id: str):
+    """Insert a voice profile and make it the user's active one"""
+    profile_dict = profile.model_dump()
+    user_update = {"$set": {"voice_profile_id": profile.id}}
+    
+    async def write_profile(session):
+        await db.voice_profiles.insert_one(profile_dict, session=session)
+        await db.users.update_one({"id": user_id}, user_update, session=session)
+    
+    if MONGO_TRANSACTIONS_AVAILABLE:
+        async with client.start_session() as session:
+            await session.with_transaction(write_profile)
+    else:
+        # profile.id is known up front, so the two writes can overlap
+        await asyncio.gather(
+            db.voice_profiles.insert_one(profile_dict),
+            db.users.update_one({"id": user_id}, user_update)
+        )
+
+async def cache_get(key: str):
+    """Read from the Redis cache: bytes on a hit, None on a miss, CACHE_UNAVAILABLE on an outage"""
+    if redis_client is None:
+        return CACHE_UNAVAILABLE
+    try:
+        return await redis_client.get(key)
+    except RedisError as e:
+        logger.warning(f"Redis cache read failed: {e}")
+        return CACHE_UNAVAILABLE
+
+async def cache_set(key: str, value: bytes, ttl_seconds: int):
+    """Write to the Redis cache, ignoring cache outages"""
+    try:
+        await redis_client.set(key, value, ex=ttl_seconds)
+    except RedisError as e:
+        logger.warning(f"Redis cache write failed: {e}")
+
+def get_http_client() -> httpx.AsyncClient:
+    """Dependency returning the shared ElevenLabs client created in lifespan"""
+    return eleven_http
+
+@lru_cache(maxsize=256)
+def _voice_settings(stability: float, similarity_boost: float, style: float, use_speaker_boost: bool) -> dict:
+    # Shared between requests, so callers must not mutate the result
+    return {
+        "stability": stability,
+        "similarity_boost": similarity_boost,
+        "style": style,
+        "use_speaker_boost": use_speaker_boost
+    }
+
+def voice_settings_for(request: TTSRequest) -> dict:
+    """ElevenLabs voice_settings payload, rounded to 2 decimals so presets share a cache entry"""
+    return _voice_settings(
+        round(request.stability, 2),
+        round(request.similarity_boost, 2),
+        round(request.style, 2),
+        request.use_speaker_boost
+    )
+
+class UploadStream:
+    """File-like view of an UploadFile for httpx multipart bodies.
+
+    Deliberately has no fileno(): httpx would call it to size the part, which forces
+    an in-memory SpooledTemporaryFile to roll over to disk. Without it httpx sizes
+    the part with seek/tell and reads it in chunks from wherever it already is.
+    """
+    def __init__(self, upload: UploadFile):
+        self._file = upload.file
+    
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+    
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+    
+    def tell(self) -> int:
+        return self._file.tell()
+
+async def fetch_available_voices(http_client: httpx.AsyncClient) -> dict:
+    """Fetch the voice list from ElevenLabs"""
+    async with eleven_semaphore:
+        response = await http_client.get("/v1/voices")
+    response.raise_for_status()
+    return {
+        "voices": [
+            {
+                "voice_id": voice["voice_id"],
+                "name": voice["name"],
+                "category": voice.get("category", "generated"),
+                "description": voice.get("description", ""),
+                "preview_url": voice.get("preview_url")
+            }
+            for voice in response.json()["voices"]
+        ]
+    }
+
+async def batch_get_users_by_email(emails: List[str]) -> Dict[str, dict]:
+    """Resolve many users by email with a single $in query"""
+    if not emails:
+        return {}
+    docs = await db.users.find(
+        {"email": {"$in": emails}},
+        USER_PROJECTION
+    ).to_list(length=None)
+    return {doc["email"]: doc for doc in docs}
 
 # Authentication Routes
 @api_router.post("/auth/register", response_model=UserResponse)
 async def register(user_data: UserCreate):
-    existing_user = await db.users.find_one({"email": user_data.email})
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
     user = User(
         username=user_data.username,
         email=user_data.email
     )
     
     user_dict = user.model_dump()
-    user_dict['password_hash'] = hash_password(user_data.password)
-    user_dict = prepare_for_mongo(user_dict)
+    user_dict['password_hash'] = await hash_password(user_data.password)
     
-    await db.users.insert_one(user_dict)
+    # The unique index on users.email enforces uniqueness atomically
+    try:
+        await db.users.insert_one(user_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     token = create_access_token(data={"sub": user.id})
     
@@ -265,15 +496,15 @@ async def register(user_data: UserCreate):
 
 @api_router.post("/auth/login", response_model=UserResponse)
 async def login(user_data: UserLogin):
-    user_doc = await db.users.find_one({"email": user_data.email}, {"_id": 0})
+    user_doc = await db.users.find_one({"email": user_data.email}, LOGIN_PROJECTION)
     if not user_doc:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    if not verify_password(user_data.password, user_doc['password_hash']):
+    if not await verify_login(user_doc['id'], user_data.password, user_doc['password_hash']):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    user_doc = parse_from_mongo(user_doc)
-    user = User(**{k: v for k, v in user_doc.items() if k != 'password_hash'})
+    # extra="ignore" drops password_hash while validating
+    user = User.model_validate(user_doc)
     
     token = create_access_token(data={"sub": user.id})
     
@@ -287,25 +518,29 @@ async def login(user_data: UserLogin):
 
 # Advanced Voice Cloning Routes
 @api_router.get("/voices/available")
-async def get_available_voices():
+async def get_available_voices(http_client: httpx.AsyncClient = Depends(get_http_client)):
     """Get all available ElevenLabs voices"""
     if not ELEVENLABS_AVAILABLE:
         raise HTTPException(status_code=503, detail="ElevenLabs service not available")
     
+    cached = await cache_get(VOICES_CACHE_KEY)
+    if cached is not None and cached is not CACHE_UNAVAILABLE:
+        return Response(content=cached, media_type="application/json")
+    
     try:
-        voices_response = await run_sync(lambda: eleven_client.voices.get_all())
-        return {
-            "voices": [
-                {
-                    "voice_id": voice.voice_id,
-                    "name": voice.name,
-                    "category": voice.category if hasattr(voice, 'category') else 'generated',
-                    "description": voice.description if hasattr(voice, 'description') else '',
-                    "preview_url": voice.preview_url if hasattr(voice, 'preview_url') else None
-                }
-                for voice in voices_response.voices
-            ]
-        }
+        if cached is CACHE_UNAVAILABLE:
+            # No cache to fill, so don't serialise requests behind the lock
+            return await fetch_available_voices(http_client)
+        
+        # Coalesce concurrent misses into a single upstream fetch
+        async with voices_cache_lock:
+            cached = await cache_get(VOICES_CACHE_KEY)
+            if cached is not None and cached is not CACHE_UNAVAILABLE:
+                return Response(content=cached, media_type="application/json")
+            
+            voices = await fetch_available_voices(http_client)
+            await cache_set(VOICES_CACHE_KEY, orjson.dumps(voices), VOICES_CACHE_TTL_SECONDS)
+            return voices
     except Exception as e:
         logger.error(f"Error fetching voices: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching voices: {str(e)}")
@@ -315,58 +550,51 @@ async def clone_voice(
     voice_name: str = Form(...),
     description: str = Form(""),
     files: List[UploadFile] = File(...),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    http_client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """Clone a voice using uploaded audio samples"""
     if not ELEVENLABS_AVAILABLE:
         raise HTTPException(status_code=503, detail="ElevenLabs service not available")
     
+    # Validate all files up front, outside the try so the 400 isn't reported as a 500
+    invalid = next((f for f in files if not (f.content_type or "").startswith('audio/')), None)
+    if invalid is not None:
+        raise HTTPException(status_code=400, detail=f"Invalid file type: {invalid.filename}")
+    
+    # httpx streams the spooled upload files in chunks while sending
+    audio_files = [("files", (f.filename, UploadStream(f), f.content_type)) for f in files]
+    
     try:
-        # Validate files
-        audio_files = []
-        for file in files:
-            if not file.content_type or not file.content_type.startswith('audio/'):
-                raise HTTPException(status_code=400, detail=f"Invalid file type: {file.filename}")
-            
-            content = await file.read()
-            audio_files.append((file.filename, content, file.content_type))
-        
         # Clone voice using ElevenLabs
-        def clone_voice_sync():
-            return eleven_client.clone(
-                name=voice_name,
-                description=description,
+        async with eleven_semaphore:
+            response = await http_client.post(
+                "/v1/voices/add",
+                data={"name": voice_name, "description": description},
                 files=audio_files
             )
-        
-        voice_result = await run_sync(clone_voice_sync)
+        response.raise_for_status()
+        voice_id = response.json()["voice_id"]
         
         # Create voice profile in database
         voice_profile = VoiceProfile(
             user_id=current_user.id,
             name=voice_name,
-            voice_id=voice_result.voice_id,
+            voice_id=voice_id,
             voice_data={
                 "description": description,
-                "elevenlabs_voice_id": voice_result.voice_id,
+                "elevenlabs_voice_id": voice_id,
                 "samples_count": len(files)
             },
             samples_count=len(files),
             training_status="ready"
         )
         
-        profile_dict = voice_profile.model_dump()
-        profile_dict = prepare_for_mongo(profile_dict)
-        await db.voice_profiles.insert_one(profile_dict)
-        
-        # Update user's active voice profile
-        await db.users.update_one(
-            {"id": current_user.id},
-            {"$set": {"voice_profile_id": voice_profile.id}}
-        )
+        # Save the profile and make it the user's active one
+        await save_active_voice_profile(voice_profile, current_user.id)
         
         return VoiceCloneResponse(
-            voice_id=voice_result.voice_id,
+            voice_id=voice_id,
             name=voice_name,
             status="ready",
             message="Voice cloned successfully"
@@ -376,83 +604,157 @@ async def clone_voice(
         logger.error(f"Error cloning voice: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error cloning voice: {str(e)}")
 
-@api_router.post("/tts/generate", response_model=TTSResponse)
+@api_router.post("/tts/generate")
 async def generate_tts(
     request: TTSRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    http_client: httpx.AsyncClient = Depends(get_http_client)
 ):
-    """Generate text-to-speech audio using ElevenLabs"""
+    """Stream text-to-speech audio from ElevenLabs straight to the client"""
     if not ELEVENLABS_AVAILABLE:
         raise HTTPException(status_code=503, detail="ElevenLabs service not available")
     
+    # Held until the audio stream is finished, not just until headers arrive
+    await eleven_semaphore.acquire()
     try:
         # Generate audio using ElevenLabs
-        voice_settings = VoiceSettings(
-            stability=request.stability,
-            similarity_boost=request.similarity_boost,
-            style=request.style,
-            use_speaker_boost=request.use_speaker_boost
-        )
-        
-        def generate_tts_sync():
-            return eleven_client.generate(
-                text=request.text,
-                voice=request.voice_id,
-                voice_settings=voice_settings,
-                model="eleven_multilingual_v2"
-            )
-        
-        audio_generator = await run_sync(generate_tts_sync)
-        
-        # Collect audio data
-        audio_data = b""
-        for chunk in audio_generator:
-            audio_data += chunk
-        
-        # Convert to base64 for storage/transfer
-        audio_b64 = base64.b64encode(audio_data).decode()
-        
-        # Create response
-        tts_response = TTSResponse(
-            audio_url=f"data:audio/mpeg;base64,{audio_b64}",
-            text=request.text,
-            voice_id=request.voice_id
+        upstream = await http_client.send(
+            http_client.build_request(
+                "POST",
+                f"/v1/text-to-speech/{request.voice_id}/stream",
+                json={
+                    "text": request.text,
+                    "model_id": "eleven_multilingual_v2",
+                    "voice_settings": voice_settings_for(request)
+                }
+            ),
+            stream=True
         )
-        
-        # Save to database
-        tts_dict = prepare_for_mongo(tts_response.model_dump())
-        await db.tts_generations.insert_one(tts_dict)
-        
-        return tts_response
-        
     except Exception as e:
+        eleven_semaphore.release()
         logger.error(f"Error generating TTS: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generating TTS: {str(e)}")
+    
+    upstream_open = True
+    
+    async def close_upstream():
+        nonlocal upstream_open
+        if upstream_open:
+            upstream_open = False
+            await upstream.aclose()
+            eleven_semaphore.release()
+    
+    if upstream.is_error:
+        await close_upstream()
+        logger.error(f"Error generating TTS: ElevenLabs returned {upstream.status_code}")
+        raise HTTPException(status_code=500, detail=f"Error generating TTS: ElevenLabs returned {upstream.status_code}")
+    
+    generation = TTSGeneration(
+        user_id=current_user.id,
+        text=request.text,
+        voice_id=request.voice_id
+    )
+    
+    audio_upload = tts_audio_bucket.open_upload_stream(
+        f"{generation.generation_id}.mp3",
+        metadata={"contentType": "audio/mpeg", "user_id": current_user.id}
+    )
+    
+    async def abort_upload():
+        if not audio_upload.closed:
+            try:
+                await audio_upload.abort()
+            except PyMongoError as e:
+                logger.warning(f"Failed to abort TTS audio upload: {e}")
+    
+    async def stream_audio():
+        # Archiving is best effort: a failing or slow GridFS write never interrupts playback
+        archiving = True
+        try:
+            async for chunk in upstream.aiter_bytes():
+                generation.size += len(chunk)
+                if archiving:
+                    try:
+                        # GridFS buffers writes into 255 KB chunk documents
+                        await asyncio.wait_for(audio_upload.write(chunk), TTS_ARCHIVE_WRITE_TIMEOUT_SECONDS)
+                    except (PyMongoError, asyncio.TimeoutError) as e:
+                        logger.warning(f"Archiving TTS audio failed, continuing without it: {e!r}")
+                        archiving = False
+                        await abort_upload()
+                yield chunk
+            if archiving:
+                try:
+                    await audio_upload.close()
+                    generation.audio_ref = str(audio_upload._id)
+                except PyMongoError as e:
+                    logger.warning(f"Archiving TTS audio failed: {e}")
+        finally:
+            # Also covers upstream errors mid-stream, which skip the background task
+            await abort_upload()
+            await close_upstream()
+    
+    async def finish_generation():
+        # Runs once the response is done, including on client disconnect, when the
+        # abandoned generator's finally may not run until it is garbage-collected
+        await abort_upload()
+        await close_upstream()
+        # audio_ref stays None when the audio wasn't fully archived
+        await db.tts_generations.insert_one(generation.model_dump())
+    
+    return StreamingResponse(
+        stream_audio(),
+        media_type="audio/mpeg",
+        headers={"X-Generation-Id": generation.generation_id},
+        background=BackgroundTask(finish_generation)
+    )
+
+@api_router.get("/tts/{generation_id}/audio")
+async def get_tts_audio(generation_id: str, current_user: User = Depends(get_current_user)):
+    """Stream back previously generated TTS audio from GridFS"""
+    generation = await db.tts_generations.find_one(
+        {"generation_id": generation_id, "user_id": current_user.id},
+        {"_id": 0, "audio_ref": 1}
+    )
+    if not generation or not generation.get("audio_ref"):
+        raise HTTPException(status_code=404, detail="Audio not found")
+    
+    try:
+        audio = await tts_audio_bucket.open_download_stream(ObjectId(generation["audio_ref"]))
+    except NoFile:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    
+    async def iter_audio():
+        while chunk := await audio.readchunk():
+            yield chunk
+    
+    return StreamingResponse(
+        iter_audio(),
+        media_type="audio/mpeg",
+        headers={"Content-Length": str(audio.length)}
+    )
 
 @api_router.post("/stt/transcribe", response_model=STTResponse)
 async def transcribe_audio(
+    background_tasks: BackgroundTasks,
     audio_file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    http_client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """Transcribe audio file to text using ElevenLabs Speech-to-Text"""
     if not ELEVENLABS_AVAILABLE:
         raise HTTPException(status_code=503, detail="ElevenLabs service not available")
     
     try:
-        # Read uploaded audio file
-        audio_content = await audio_file.read()
-        
         # Transcribe using ElevenLabs Speech-to-Text
-        def transcribe_sync():
-            return eleven_client.speech_to_text.convert(
-                file=io.BytesIO(audio_content),
-                model_id="scribe_v1"
+        async with eleven_semaphore:
+            response = await http_client.post(
+                "/v1/speech-to-text",
+                data={"model_id": "scribe_v1"},
+                files={"file": (audio_file.filename or "unknown.audio", UploadStream(audio_file), audio_file.content_type)}
             )
+        response.raise_for_status()
         
-        transcription_response = await run_sync(transcribe_sync)
-        
-        # Extract text from response
-        transcribed_text = transcription_response.text if hasattr(transcription_response, 'text') else str(transcription_response)
+        transcribed_text = response.json().get("text", "")
         
         # Create response
         stt_response = STTResponse(
@@ -460,9 +762,8 @@ async def transcribe_audio(
             filename=audio_file.filename or "unknown.audio"
         )
         
-        # Save to database
-        stt_dict = prepare_for_mongo(stt_response.model_dump())
-        await db.stt_transcriptions.insert_one(stt_dict)
+        # Save to database once the response has been sent; the client doesn't wait on the write
+        background_tasks.add_task(db.stt_transcriptions.insert_one, stt_response.model_dump())
         
         return stt_response
         
@@ -484,26 +785,23 @@ async def create_voice_profile(profile_data: VoiceProfileCreate, current_user: U
         }
     )
     
-    profile_dict = profile.model_dump()
-    profile_dict = prepare_for_mongo(profile_dict)
-    
-    await db.voice_profiles.insert_one(profile_dict)
-    
-    await db.users.update_one(
-        {"id": current_user.id},
-        {"$set": {"voice_profile_id": profile.id}}
-    )
+    await save_active_voice_profile(profile, current_user.id)
     
     return profile
 
 @api_router.get("/voice-profiles", response_model=List[VoiceProfile])
-async def get_voice_profiles(current_user: User = Depends(get_current_user)):
-    profiles = await db.voice_profiles.find({"user_id": current_user.id}, {"_id": 0}).to_list(length=None)
-    
-    for profile in profiles:
-        profile = parse_from_mongo(profile)
+async def get_voice_profiles(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user)
+):
+    profiles = await db.voice_profiles.find(
+        {"user_id": current_user.id},
+        VOICE_PROFILE_PROJECTION
+    ).sort("created_at", -1).skip(skip).limit(limit).to_list(length=limit)
     
-    return [VoiceProfile(**profile) for profile in profiles]
+    # response_model validates the documents once on the way out
+    return profiles
 
 # Call Management Routes
 @api_router.post("/calls", response_model=Call)
@@ -515,28 +813,38 @@ async def create_call(call_data: CallCreate, current_user: User = Depends(get_cu
     )
     
     if call_data.receiver_email:
-        receiver = await db.users.find_one({"email": call_data.receiver_email}, {"_id": 0})
+        receivers = await batch_get_users_by_email([call_data.receiver_email])
+        receiver = receivers.get(call_data.receiver_email)
         if receiver:
             call.receiver_id = receiver['id']
     
     call_dict = call.model_dump()
-    call_dict = prepare_for_mongo(call_dict)
     
     await db.calls.insert_one(call_dict)
     
     return call
 
-@api_router.get("/calls", response_model=List[Call])
-async def get_calls(current_user: User = Depends(get_current_user)):
-    calls = await db.calls.find(
-        {"$or": [{"caller_id": current_user.id}, {"receiver_id": current_user.id}]},
-        {"_id": 0}
-    ).to_list(length=None)
-    
-    for call in calls:
-        call = parse_from_mongo(call)
-    
-    return [Call(**call) for call in calls]
+@api_router.get("/calls", response_model=List[CallDetails])
+async def get_calls(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user)
+):
+    # Join caller/receiver details in the same round-trip, for the requested page only
+    cursor = await db.calls.aggregate([
+        {"$match": {"$or": [{"caller_id": current_user.id}, {"receiver_id": current_user.id}]}},
+        {"$sort": {"created_at": -1}},
+        {"$skip": skip},
+        {"$limit": limit},
+        {"$lookup": {"from": "users", "localField": "caller_id", "foreignField": "id", "as": "caller"}},
+        {"$lookup": {"from": "users", "localField": "receiver_id", "foreignField": "id", "as": "receiver"}},
+        {"$set": {"caller": {"$first": "$caller"}, "receiver": {"$first": "$receiver"}}},
+        {"$project": CALL_DETAILS_PROJECTION}
+    ])
+    calls = await cursor.to_list(length=limit)
+    
+    # response_model validates the documents once on the way out
+    return calls
 
 @api_router.patch("/calls/{call_id}/join")
 async def join_call(call_id: str, current_user: User = Depends(get_current_user)):
@@ -554,7 +862,7 @@ async def join_call(call_id: str, current_user: User = Depends(get_current_user)
 async def end_call(call_id: str, current_user: User = Depends(get_current_user)):
     result = await db.calls.update_one(
         {"id": call_id, "$or": [{"caller_id": current_user.id}, {"receiver_id": current_user.id}]},
-        {"$set": {"status": "ended", "ended_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"status": "ended", "ended_at": datetime.now(timezone.utc)}}
     )
     
     if result.matched_count == 0:
@@ -563,27 +871,31 @@ async def end_call(call_id: str, current_user: User = Depends(get_current_user))
     return {"status": "ended"}
 
 # System Status Routes
+# These only change on restart, so they are built once at import
+ROOT_STATUS = {
+    "message": "VoiceMirror - Advanced Voice Clone Stream API is running!", 
+    "version": "2.0.0",
+    "features": {
+        "realtime_available": REALTIME_AVAILABLE,
+        "elevenlabs_available": ELEVENLABS_AVAILABLE,
+        "voice_cloning": ELEVENLABS_AVAILABLE,
+        "text_to_speech": ELEVENLABS_AVAILABLE,
+        "speech_to_text": ELEVENLABS_AVAILABLE
+    }
+}
+REALTIME_STATUS = {
+    "available": REALTIME_AVAILABLE,
+    "message": "OpenAI realtime voice cloning available" if REALTIME_AVAILABLE else "Basic WebRTC calling only"
+}
+
 @api_router.get("/")
 async def root():
-    return {
-        "message": "VoiceMirror - Advanced Voice Clone Stream API is running!", 
-        "version": "2.0.0",
-        "features": {
-            "realtime_available": REALTIME_AVAILABLE,
-            "elevenlabs_available": ELEVENLABS_AVAILABLE,
-            "voice_cloning": ELEVENLABS_AVAILABLE,
-            "text_to_speech": ELEVENLABS_AVAILABLE,
-            "speech_to_text": ELEVENLABS_AVAILABLE
-        }
-    }
+    return ROOT_STATUS
 
 @api_router.get("/realtime/status")
 async def realtime_status():
     """Check if OpenAI realtime features are available"""
-    return {
-        "available": REALTIME_AVAILABLE,
-        "message": "OpenAI realtime voice cloning available" if REALTIME_AVAILABLE else "Basic WebRTC calling only"
-    }
+    return REALTIME_STATUS
 
 @api_router.get("/voice/status")
 async def voice_status():
@@ -598,7 +910,11 @@ async def voice_status():
 
 @api_router.get("/users/me", response_model=User)
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
-    return current_user
+    # Fresh read: the cached user may predate a voice profile change made on another worker
+    user_doc = await db.users.find_one({"id": current_user.id}, USER_PROJECTION)
+    if user_doc is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user_doc
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -609,10 +925,5 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Generation-Id"],
 )
-
-# Logging already configured above
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
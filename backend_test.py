@@ -1,7 +1,23 @@
-import requests
+import httpx
+import asyncio
+import argparse
+import os
 import sys
 import json
+import orjson
+import time
 from datetime import datetime
+from pathlib import Path
+
+# Transient gateway errors are retried for GET/PATCH only; POSTs aren't idempotent
+RETRY_ATTEMPTS = 4
+RETRY_BACKOFF = 0.3
+RETRY_STATUSES = (502, 503, 504)
+RETRY_METHODS = ('GET', 'PATCH')
+
+# --reuse-auth keeps the last run's credentials here for up to an hour
+TOKEN_CACHE_PATH = Path('~/.voice_mirror_test_token').expanduser()
+TOKEN_CACHE_MAX_AGE = 3600
 
 class VoiceMirrorAPITester:
     def __init__(self, base_url="https://voice-mirror-live.preview.emergentagent.com"):
@@ -10,84 +26,147 @@ class VoiceMirrorAPITester:
         self.user_id = None
         self.tests_run = 0
         self.tests_passed = 0
-        self.test_results = []
+        # Only failures are kept; passes just bump the counters
+        self.failed_tests = []
+        self.started_at = time.monotonic()
+        # One multiplexed HTTP/2 connection for the whole run; the transport retries failed connects
+        self.client = httpx.AsyncClient(
+            base_url=f"{base_url}/api/",
+            timeout=10.0,
+            headers={'Content-Type': 'application/json'},
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                retries=3,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+            )
+        )
+
+    def set_token(self, token):
+        """Store the auth token and send it on every subsequent request"""
+        self.token = token
+        if token:
+            self.client.headers['Authorization'] = f'Bearer {token}'
+        else:
+            self.client.headers.pop('Authorization', None)
+
+    async def close(self):
+        """Release the pooled connection"""
+        await self.client.aclose()
+
+    async def send(self, method, endpoint, data=None, headers=None):
+        """Send a request, retrying transient gateway errors on idempotent methods"""
+        attempts = RETRY_ATTEMPTS if method in RETRY_METHODS else 1
+        for attempt in range(attempts):
+            if attempt:
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+            # Serialised with orjson; Content-Type is already set on the client
+            content = orjson.dumps(data) if data is not None else None
+            response = await self.client.request(method, endpoint, content=content, headers=headers)
+            if response.status_code not in RETRY_STATUSES:
+                break
+        return response
 
     def log_test(self, name, success, details=""):
         """Log test result"""
         self.tests_run += 1
         if success:
             self.tests_passed += 1
-        
-        result = {
-            "test": name,
-            "status": "PASS" if success else "FAIL",
-            "details": details,
-            "timestamp": datetime.now().isoformat()
-        }
-        self.test_results.append(result)
+        else:
+            # Seconds since the tester was created
+            self.failed_tests.append((name, details, time.monotonic() - self.started_at))
         
         status_icon = "✅" if success else "❌"
         print(f"{status_icon} {name}: {details}")
 
-    def run_test(self, name, method, endpoint, expected_status, data=None, headers=None):
+    async def run_test(self, name, method, endpoint, expected_status, data=None, headers=None):
         """Run a single API test"""
-        url = f"{self.base_url}/api/{endpoint}"
-        test_headers = {'Content-Type': 'application/json'}
-        
-        if self.token:
-            test_headers['Authorization'] = f'Bearer {self.token}'
-        
-        if headers:
-            test_headers.update(headers)
-
+        # Only the network call is guarded; parsing and logging run outside the handler
         try:
-            if method == 'GET':
-                response = requests.get(url, headers=test_headers, timeout=10)
-            elif method == 'POST':
-                response = requests.post(url, json=data, headers=test_headers, timeout=10)
-            elif method == 'PATCH':
-                response = requests.patch(url, json=data, headers=test_headers, timeout=10)
+            # Content-Type and Authorization come from the client headers
+            response = await self.send(method, endpoint, data=data, headers=headers)
+        except httpx.RequestError as e:
+            self.log_test(name, False, f"Network error: {e}")
+            return False, {}
 
-            success = response.status_code == expected_status
-            
-            if success:
-                try:
-                    response_data = response.json()
-                    details = f"Status: {response.status_code}"
-                    if 'message' in response_data:
-                        details += f", Message: {response_data['message']}"
-                except:
-                    response_data = {}
-                    details = f"Status: {response.status_code}"
+        success = response.status_code == expected_status
+        
+        # Parse the body once for both branches
+        raw = response.content
+        try:
+            body = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            body = None
+        
+        if success:
+            response_data = body if body is not None else {}
+            details = f"Status: {response.status_code}"
+            if isinstance(body, dict) and 'message' in body:
+                details += f", Message: {body['message']}"
+        else:
+            if isinstance(body, dict):
+                details = f"Expected {expected_status}, got {response.status_code}. Error: {body.get('detail', 'Unknown error')}"
             else:
-                try:
-                    error_data = response.json()
-                    details = f"Expected {expected_status}, got {response.status_code}. Error: {error_data.get('detail', 'Unknown error')}"
-                except:
-                    details = f"Expected {expected_status}, got {response.status_code}. Response: {response.text[:100]}"
-                response_data = {}
+                # Only decode the bytes that are shown
+                details = f"Expected {expected_status}, got {response.status_code}. Response: {raw[:100].decode('utf-8', 'replace')}"
+            response_data = {}
 
-            self.log_test(name, success, details)
-            return success, response_data
+        self.log_test(name, success, details)
+        return success, response_data
 
-        except requests.exceptions.RequestException as e:
-            details = f"Network error: {str(e)}"
-            self.log_test(name, False, details)
-            return False, {}
+    async def warm_up(self):
+        """Open the connection (DNS, TCP, TLS, HTTP/2 SETTINGS) before anything is timed"""
+        try:
+            # FastAPI doesn't answer HEAD on GET routes, so use the cheap root endpoint
+            await self.client.get('', timeout=5.0)
+        except httpx.HTTPError:
+            # The health check will report the failure
+            pass
 
-    def test_health_check(self):
-        """Test API health check"""
-        success, response = self.run_test(
-            "API Health Check",
-            "GET",
-            "",
-            200
-        )
-        return success
+    async def load_cached_auth(self):
+        """Reuse a recent token from TOKEN_CACHE_PATH if the server still accepts it"""
+        try:
+            if time.time() - TOKEN_CACHE_PATH.stat().st_mtime > TOKEN_CACHE_MAX_AGE:
+                return False
+            cached = orjson.loads(TOKEN_CACHE_PATH.read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            return False
+        # Anything other than an object with a token is treated as a miss
+        if not isinstance(cached, dict) or not isinstance(cached.get('token'), str):
+            return False
+        
+        self.set_token(cached['token'])
+        try:
+            response = await self.send('GET', 'users/me')
+        except httpx.HTTPError:
+            response = None
+        if response is None or response.status_code != 200:
+            self.set_token(None)
+            return False
+        
+        self.user_id = cached.get('user_id')
+        self.log_test("Cached Auth Reuse", True, f"Reusing token for {cached.get('email')}")
+        return True
 
-    def test_register(self, username, email, password):
+    def save_cached_auth(self, username, email):
+        """Atomically write the current token to TOKEN_CACHE_PATH, readable only by the owner"""
+        tmp_path = TOKEN_CACHE_PATH.with_suffix('.tmp')
+        payload = orjson.dumps({
+            "token": self.token,
+            "user_id": self.user_id,
+            "username": username,
+            "email": email
+        })
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, TOKEN_CACHE_PATH)
+        except OSError as e:
+            print(f"⚠️  Could not cache auth token: {e}")
+
+    async def test_register(self, username, email, password):
         """Test user registration"""
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "User Registration",
             "POST",
             "auth/register",
@@ -100,7 +179,7 @@ class VoiceMirrorAPITester:
         )
         
         if success and 'token' in response:
-            self.token = response['token']
+            self.set_token(response['token'])
             self.user_id = response['id']
             self.log_test("Token Extraction", True, f"Token received and stored")
         elif success:
@@ -108,9 +187,9 @@ class VoiceMirrorAPITester:
             
         return success
 
-    def test_login(self, email, password):
+    async def test_login(self, email, password):
         """Test user login"""
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "User Login",
             "POST",
             "auth/login",
@@ -122,7 +201,7 @@ class VoiceMirrorAPITester:
         )
         
         if success and 'token' in response:
-            self.token = response['token']
+            self.set_token(response['token'])
             self.user_id = response['id']
             self.log_test("Login Token Extraction", True, f"Login token received")
         elif success:
@@ -130,27 +209,13 @@ class VoiceMirrorAPITester:
             
         return success
 
-    def test_get_user_info(self):
-        """Test getting current user info"""
-        if not self.token:
-            self.log_test("Get User Info", False, "No authentication token available")
-            return False
-            
-        success, response = self.run_test(
-            "Get Current User Info",
-            "GET",
-            "users/me",
-            200
-        )
-        return success
-
-    def test_create_voice_profile(self):
+    async def test_create_voice_profile(self):
         """Test creating a voice profile"""
         if not self.token:
             self.log_test("Create Voice Profile", False, "No authentication token available")
             return False, None
             
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Create Voice Profile",
             "POST",
             "voice-profiles",
@@ -169,25 +234,11 @@ class VoiceMirrorAPITester:
         profile_id = response.get('id') if success else None
         return success, profile_id
 
-    def test_get_voice_profiles(self):
-        """Test getting voice profiles"""
-        if not self.token:
-            self.log_test("Get Voice Profiles", False, "No authentication token available")
-            return False
-            
-        success, response = self.run_test(
-            "Get Voice Profiles",
-            "GET",
-            "voice-profiles",
-            200
-        )
-        return success
-
-    def test_create_call(self, receiver_email=None):
+    async def test_create_call(self, receiver_email=None):
         """Test creating a call"""
         if not self.token:
             self.log_test("Create Call", False, "No authentication token available")
-            return False, None
+            return False, None, None
             
         call_data = {
             "call_type": "voice_clone",
@@ -200,7 +251,7 @@ class VoiceMirrorAPITester:
         if receiver_email:
             call_data["receiver_email"] = receiver_email
             
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Create Call",
             "POST",
             "calls",
@@ -212,27 +263,13 @@ class VoiceMirrorAPITester:
         room_id = response.get('room_id') if success else None
         return success, call_id, room_id
 
-    def test_get_calls(self):
-        """Test getting user calls"""
-        if not self.token:
-            self.log_test("Get Calls", False, "No authentication token available")
-            return False
-            
-        success, response = self.run_test(
-            "Get User Calls",
-            "GET",
-            "calls",
-            200
-        )
-        return success
-
-    def test_join_call(self, call_id):
+    async def test_join_call(self, call_id):
         """Test joining a call"""
         if not self.token or not call_id:
             self.log_test("Join Call", False, "No authentication token or call ID available")
             return False
             
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Join Call",
             "PATCH",
             f"calls/{call_id}/join",
@@ -240,13 +277,13 @@ class VoiceMirrorAPITester:
         )
         return success
 
-    def test_end_call(self, call_id):
+    async def test_end_call(self, call_id):
         """Test ending a call"""
         if not self.token or not call_id:
             self.log_test("End Call", False, "No authentication token or call ID available")
             return False
             
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "End Call",
             "PATCH",
             f"calls/{call_id}/end",
@@ -254,23 +291,30 @@ class VoiceMirrorAPITester:
         )
         return success
 
-    def test_invalid_token(self):
-        """Test API with invalid token"""
-        original_token = self.token
-        self.token = "invalid_token_12345"
+    async def test_call_lifecycle(self):
+        """Create a call, then join and end it in order"""
+        call_success, call_id, room_id = await self.test_create_call()
         
-        success, response = self.run_test(
+        # Only join/end wait on the call id; join must land before end
+        if call_success and call_id:
+            await self.test_join_call(call_id)
+            await self.test_end_call(call_id)
+        return call_success
+
+    async def test_invalid_token(self):
+        """Test API with invalid token"""
+        # Overridden per request so concurrent tests keep using the real token
+        success, response = await self.run_test(
             "Invalid Token Test",
             "GET",
             "users/me",
-            401
+            401,
+            headers={'Authorization': 'Bearer invalid_token_12345'}
         )
-        
-        self.token = original_token
         return success
 
-    def run_comprehensive_test(self):
-        """Run all tests in sequence"""
+    async def run_comprehensive_test(self, reuse_auth=False):
+        """Run all tests, concurrently where they don't depend on each other"""
         print("🚀 Starting VoiceMirror API Comprehensive Test Suite")
         print("=" * 60)
         
@@ -280,39 +324,32 @@ class VoiceMirrorAPITester:
         test_email = f"test_{timestamp}@example.com"
         test_password = "TestPass123!"
         
+        await self.warm_up()
+        
         # 1. Health Check
         print("\n📋 Testing API Health...")
-        self.test_health_check()
+        await self.test_health_check()
         
-        # 2. Authentication Tests
+        # 2. Authentication Tests (serial: everything after needs the token)
         print("\n🔐 Testing Authentication...")
-        if self.test_register(test_username, test_email, test_password):
-            self.test_get_user_info()
-            
-            # Test login with same credentials
-            self.test_login(test_email, test_password)
-        
-        # 3. Voice Profile Tests
-        print("\n🎤 Testing Voice Profiles...")
-        profile_success, profile_id = self.test_create_voice_profile()
-        self.test_get_voice_profiles()
+        if not (reuse_auth and await self.load_cached_auth()):
+            if await self.test_register(test_username, test_email, test_password):
+                # Test login with same credentials
+                if await self.test_login(test_email, test_password) and reuse_auth:
+                    self.save_cached_auth(test_username, test_email)
         
-        # 4. Call Management Tests
-        print("\n📞 Testing Call Management...")
-        call_success, call_id, room_id = self.test_create_call()
-        self.test_get_calls()
-        
-        if call_success and call_id:
-            self.test_join_call(call_id)
-            self.test_end_call(call_id)
-        
-        # 5. Security Tests
-        print("\n🔒 Testing Security...")
-        self.test_invalid_token()
-        
-        # 6. Test with receiver email
-        print("\n📧 Testing Call with Receiver Email...")
-        self.test_create_call("receiver@example.com")
+        # 3. Independent tests, run concurrently over the shared connection; the voice
+        # profile and the first call are created in the same round-trip
+        print("\n⚡ Testing User Info, Voice Profiles, Calls and Security concurrently...")
+        await asyncio.gather(
+            self.test_get_user_info(),
+            self.test_create_voice_profile(),
+            self.test_call_lifecycle(),
+            self.test_get_voice_profiles(),
+            self.test_get_calls(),
+            self.test_invalid_token(),
+            self.test_create_call("receiver@example.com")
+        )
         
         # Print Results
         print("\n" + "=" * 60)
@@ -324,27 +361,60 @@ class VoiceMirrorAPITester:
         print(f"Tests Passed: {self.tests_passed}")
         print(f"Tests Failed: {self.tests_run - self.tests_passed}")
         print(f"Success Rate: {success_rate:.1f}%")
+        print(f"Duration: {time.monotonic() - self.started_at:.2f}s")
         
         # Show failed tests
-        failed_tests = [test for test in self.test_results if test['status'] == 'FAIL']
-        if failed_tests:
-            print(f"\n❌ FAILED TESTS ({len(failed_tests)}):")
-            for test in failed_tests:
-                print(f"  • {test['test']}: {test['details']}")
+        if self.failed_tests:
+            print(f"\n❌ FAILED TESTS ({len(self.failed_tests)}):")
+            for name, details, elapsed in self.failed_tests:
+                print(f"  • [{elapsed:.2f}s] {name}: {details}")
         
         print("\n" + "=" * 60)
         return success_rate >= 80  # Consider 80%+ success rate as passing
 
-def main():
+# Plain GET checks: (method name, test name, endpoint, expected status, needs auth)
+GET_TESTS = [
+    ("test_health_check", "API Health Check", "", 200, False),
+    ("test_get_user_info", "Get Current User Info", "users/me", 200, True),
+    ("test_get_voice_profiles", "Get Voice Profiles", "voice-profiles", 200, True),
+    ("test_get_calls", "Get User Calls", "calls", 200, True),
+]
+
+def make_get_test(method_name, name, endpoint, expected_status, needs_auth):
+    """Build a tester method that GETs endpoint and checks the status"""
+    async def test(self):
+        if needs_auth and not self.token:
+            self.log_test(name, False, "No authentication token available")
+            return False
+        success, response = await self.run_test(name, "GET", endpoint, expected_status)
+        return success
+    test.__name__ = method_name
+    test.__doc__ = f"Test {name}"
+    return test
+
+for spec in GET_TESTS:
+    setattr(VoiceMirrorAPITester, spec[0], make_get_test(*spec))
+
+async def main():
     """Main test execution"""
+    parser = argparse.ArgumentParser(description="VoiceMirror API test suite")
+    parser.add_argument(
+        "--reuse-auth",
+        action="store_true",
+        help=f"reuse a token from {TOKEN_CACHE_PATH} younger than an hour instead of registering a new user"
+    )
+    args = parser.parse_args()
+    
     tester = VoiceMirrorAPITester()
     
     try:
-        success = tester.run_comprehensive_test()
+        success = await tester.run_comprehensive_test(reuse_auth=args.reuse_auth)
         return 0 if success else 1
     except Exception as e:
         print(f"❌ Test suite failed with error: {str(e)}")
         return 1
+    finally:
+        await tester.close()
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(asyncio.run(main()))
\ No newline at end of file
@@ -6,6 +6,7 @@ import { Badge } from './ui/badge';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from './ui/tabs';
 import { useAuth } from '../App';
 import { toast } from 'sonner';
+import { streamAudioResponse } from '../lib/streamingAudio';
 import {
   Mic,
   MicOff,
@@ -401,8 +402,13 @@ const EnhancedCallInterface = () => {
       });
 
       if (response.ok) {
-        const result = await response.json();
-        const audio = new Audio(result.audio_url);
+        // Starts playing while the rest of the audio is still streaming in
+        const { url, done } = await streamAudioResponse(response);
+        const audio = new Audio(url);
+        const release = () => URL.revokeObjectURL(url);
+        audio.addEventListener('ended', release, { once: true });
+        audio.addEventListener('error', release, { once: true });
+        done.catch((error) => console.error('Error streaming test speech:', error));
         audio.play();
         toast.success('Test speech generated!');
       } else {
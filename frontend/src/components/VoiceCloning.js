@@ -9,6 +9,7 @@ import { Badge } from './ui/badge';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from './ui/tabs';
 import { useAuth } from '../App';
 import { toast } from 'sonner';
+import { streamAudioResponse } from '../lib/streamingAudio';
 import {
   Mic,
   Upload,
@@ -16,7 +17,6 @@ import {
   Square,
   Download,
   Trash2,
-  Copy,
   Settings,
   Volume2,
   Waves,
@@ -54,8 +54,16 @@ const VoiceCloning = () => {
   });
   
   const [generatedAudio, setGeneratedAudio] = useState(null);
+  const [generatedAudioBlob, setGeneratedAudioBlob] = useState(null);
   const { token } = useAuth();
 
+  // Release the previous clip's object URL when it's replaced or the page unmounts
+  useEffect(() => {
+    return () => {
+      if (generatedAudio) URL.revokeObjectURL(generatedAudio);
+    };
+  }, [generatedAudio]);
+
   useEffect(() => {
     fetchAvailableVoices();
     fetchUserVoices();
@@ -244,8 +252,16 @@ const VoiceCloning = () => {
       });
 
       if (response.ok) {
-        const result = await response.json();
-        setGeneratedAudio(result.audio_url);
+        // Starts playing while the rest of the audio is still streaming in
+        const { url, done } = await streamAudioResponse(response);
+        setGeneratedAudioBlob(null);
+        setGeneratedAudio(url);
+        done
+          .then(setGeneratedAudioBlob)
+          .catch((error) => {
+            console.error('Error streaming TTS audio:', error);
+            toast.error('Audio stream was interrupted');
+          });
         toast.success('Audio generated successfully!');
       } else {
         const error = await response.json();
@@ -267,13 +283,15 @@ const VoiceCloning = () => {
   };
 
   const downloadAudio = () => {
-    if (generatedAudio) {
+    if (generatedAudioBlob) {
+      const url = URL.createObjectURL(generatedAudioBlob);
       const link = document.createElement('a');
-      link.href = generatedAudio;
+      link.href = url;
       link.download = 'generated_speech.mp3';
       document.body.appendChild(link);
       link.click();
       document.body.removeChild(link);
+      URL.revokeObjectURL(url);
     }
   };
 
@@ -608,7 +626,7 @@ const VoiceCloning = () => {
                 <Card className="glass-dark border-0 p-6">
                   <h3 className="text-lg font-semibold mb-4">Generated Audio</h3>
                   <div className="space-y-4">
-                    <audio controls className="w-full" data-testid="generated-audio">
+                    <audio key={generatedAudio} controls autoPlay className="w-full" data-testid="generated-audio">
                       <source src={generatedAudio} type="audio/mpeg" />
                       Your browser does not support the audio element.
                     </audio>
@@ -616,21 +634,13 @@ const VoiceCloning = () => {
                     <div className="flex gap-4">
                       <Button
                         onClick={downloadAudio}
+                        disabled={!generatedAudioBlob}
                         className="btn-secondary flex items-center gap-2"
                         data-testid="download-audio"
                       >
                         <Download className="w-4 h-4" />
                         Download
                       </Button>
-                      
-                      <Button
-                        onClick={() => navigator.clipboard.writeText(generatedAudio)}
-                        className="btn-secondary flex items-center gap-2"
-                        data-testid="copy-audio-url"
-                      >
-                        <Copy className="w-4 h-4" />
-                        Copy URL
-                      </Button>
                     </div>
                   </div>
                 </Card>
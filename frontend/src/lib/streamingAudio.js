@@ -0,0 +1,52 @@
+// Play a streamed audio response as it downloads. Where MediaSource can't handle the
+// format, falls back to buffering the whole body into a Blob first.
+//
+// Returns { url, done }: url can be set as a media element's src right away, and done
+// resolves to the complete Blob once the body has been read. The caller owns url and
+// must pass it to URL.revokeObjectURL when finished with it.
+export async function streamAudioResponse(response, type = 'audio/mpeg') {
+  if (!response.body || !window.MediaSource || !MediaSource.isTypeSupported(type)) {
+    const blob = await response.blob();
+    return { url: URL.createObjectURL(blob), done: Promise.resolve(blob) };
+  }
+
+  const mediaSource = new MediaSource();
+  const url = URL.createObjectURL(mediaSource);
+  // sourceopen fires once the url is attached to a media element
+  const done = new Promise((resolve, reject) => {
+    mediaSource.addEventListener('sourceopen', async () => {
+      try {
+        const sourceBuffer = mediaSource.addSourceBuffer(type);
+        const reader = response.body.getReader();
+        const chunks = [];
+        for (;;) {
+          const { done: finished, value } = await reader.read();
+          if (finished) break;
+          chunks.push(value);
+          await appendChunk(sourceBuffer, value);
+        }
+        mediaSource.endOfStream();
+        resolve(new Blob(chunks, { type }));
+      } catch (error) {
+        reject(error);
+      }
+    }, { once: true });
+  });
+  return { url, done };
+}
+
+function appendChunk(sourceBuffer, chunk) {
+  return new Promise((resolve, reject) => {
+    const onUpdateEnd = () => {
+      sourceBuffer.removeEventListener('error', onError);
+      resolve();
+    };
+    const onError = (event) => {
+      sourceBuffer.removeEventListener('updateend', onUpdateEnd);
+      reject(event);
+    };
+    sourceBuffer.addEventListener('updateend', onUpdateEnd, { once: true });
+    sourceBuffer.addEventListener('error', onError, { once: true });
+    sourceBuffer.appendBuffer(chunk);
+  });
+}
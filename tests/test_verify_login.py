@@ -0,0 +1,102 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from passlib.hash import bcrypt
+
+# server.py reads these at import; AsyncMongoClient doesn't connect until first use
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "voice_mirror_test")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+USER_ID = "user-1"
+PASSWORD = "TestPass123!"
+
+
+class FakeUsers:
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+
+
+class FakeDB:
+    def __init__(self):
+        self.users = FakeUsers()
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(server, "db", db)
+    server.login_cache.clear()
+    yield db
+    server.login_cache.clear()
+
+
+@pytest.fixture
+def kdf_calls(monkeypatch):
+    """Record every stored hash the KDF is run against"""
+    calls = []
+    verify_password = server.verify_password
+
+    async def counting_verify_password(plain_password, hashed_password):
+        calls.append(hashed_password)
+        return await verify_password(plain_password, hashed_password)
+
+    monkeypatch.setattr(server, "verify_password", counting_verify_password)
+    return calls
+
+
+def verify_login(password, hashed_password):
+    return asyncio.run(server.verify_login(USER_ID, password, hashed_password))
+
+
+def test_cache_hit_skips_kdf(fake_db, kdf_calls):
+    hashed = server.pwd_context.hash(PASSWORD)
+
+    assert verify_login(PASSWORD, hashed)
+    assert verify_login(PASSWORD, hashed)
+    assert kdf_calls == [hashed]
+
+
+def test_wrong_password_on_warm_cache_is_rejected(fake_db, kdf_calls):
+    hashed = server.pwd_context.hash(PASSWORD)
+    assert verify_login(PASSWORD, hashed)
+
+    assert not verify_login("WrongPass123!", hashed)
+    # The mismatch falls through to the KDF rather than being decided by the cache
+    assert kdf_calls == [hashed, hashed]
+
+
+def test_stale_entry_is_ignored_after_hash_changes(fake_db, kdf_calls):
+    old_hash = server.pwd_context.hash(PASSWORD)
+    assert verify_login(PASSWORD, old_hash)
+
+    # Password changed elsewhere: the old password must not pass on the cached entry
+    new_hash = server.pwd_context.hash("NewPass456!")
+    assert not verify_login(PASSWORD, new_hash)
+    assert kdf_calls == [old_hash, new_hash]
+
+
+def test_bcrypt_hash_is_upgraded_to_argon2id(fake_db, kdf_calls):
+    bcrypt_hash = bcrypt.hash(PASSWORD)
+
+    assert verify_login(PASSWORD, bcrypt_hash)
+
+    assert len(fake_db.users.updates) == 1
+    query, update = fake_db.users.updates[0]
+    new_hash = update["$set"]["password_hash"]
+    assert query == {"id": USER_ID}
+    assert new_hash.startswith("$argon2id$")
+    assert server.pwd_context.verify(PASSWORD, new_hash)
+
+    # The cache now tracks the upgraded hash, so a login against it skips the KDF
+    assert verify_login(PASSWORD, new_hash)
+    assert kdf_calls == [bcrypt_hash]
+    assert len(fake_db.users.updates) == 1